@@ -1,60 +1,80 @@
 """Command handlers for the Telegram bot."""
 
-from datetime import time, timedelta
+import asyncio
+from datetime import datetime, timedelta
 from telegram import Update
 from telegram.ext import ContextTypes
-from setup import get_logger, get_config
-from db import DatabaseManager
-from translations import get_translation, format_translation
-from bot.utils import remove_job_if_exists, validate_hour
-from bot.jobs import send_compliment
+from setup import get_logger, get_int
+from db import get_db
+from translations import SUPPORTED_LANGUAGES, get_translation, format_translation
+from bot.utils import remove_job_if_exists, schedule_once, validate_hour
+from bot.jobs import send_compliment, GMT
 
 logger = get_logger(__name__)
 
+# Static job settings; resolve_constants() reads them from the config once at
+# startup instead of on every command
+_DEFAULT_HOUR = 8
+_FIRST_RUN_DELAY = 10
+# Skip the first-run compliment if the daily broadcast is due this soon after it
+_FIRST_RUN_SKIP_WINDOW = 300
+
+# (24h, 12h) display strings for every hour, e.g. ("13:00", "1:00 PM")
+_HOUR_DISPLAY = tuple(
+    (f"{h:02d}:00", f"{12 if h % 12 == 0 else h % 12}:00 {'AM' if h < 12 else 'PM'}")
+    for h in range(24)
+)
+
+
+def resolve_constants() -> None:
+    """Read the handlers' static settings from the loaded config.
+    Call once after setup_application()."""
+    global _DEFAULT_HOUR, _FIRST_RUN_DELAY
+    _DEFAULT_HOUR = get_int("telegram.jobs.default_hour", _DEFAULT_HOUR)
+    _FIRST_RUN_DELAY = get_int("telegram.jobs.first_run_delay", _FIRST_RUN_DELAY)
+
+
+def _schedule_first_run(
+    context: ContextTypes.DEFAULT_TYPE, chat_id: int, hour: int
+) -> None:
+    """Replace the user's pending first-run compliment, unless the hourly
+    broadcast will deliver one shortly anyway."""
+    now = datetime.now(GMT)
+    seconds_to_next = ((hour - now.hour) % 24) * 3600 - now.minute * 60 - now.second
+    if seconds_to_next < 0:
+        seconds_to_next += 24 * 3600
+    if seconds_to_next <= _FIRST_RUN_DELAY + _FIRST_RUN_SKIP_WINDOW:
+        remove_job_if_exists(str(chat_id), context)
+        return
+
+    schedule_once(
+        context,
+        send_compliment,
+        when=timedelta(seconds=_FIRST_RUN_DELAY),
+        name=str(chat_id),
+        chat_id=chat_id,
+    )
+
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /start command."""
     chat_id = update.effective_chat.id
 
-    # Remove existing jobs if any
-    remove_job_if_exists(str(chat_id), context)
+    # Get user's hour and language or use defaults; DB calls run in a worker
+    # thread so the event loop keeps serving other updates
+    db = get_db()
+    hour, language, _ = await asyncio.to_thread(db.get_user_settings, chat_id)
 
-    # Get user's hour and language or use defaults
-    db = DatabaseManager()
-    hour = db.get_user_hour(chat_id)
-    language = db.get_user_language(chat_id)
-
-    # If user doesn't exist (hour is None), set defaults
+    # New users (hour is None) get the default hour; save everything and
+    # activate the user in one statement
     if hour is None:
-        hour = get_config("telegram.jobs.default_hour", 8)
-        # Save default hour and language for new user
-        db.set_user_hour(chat_id, hour)
-        # Ensure language is set (get_user_language returns "en" by default, but we should save it)
-        if not language or language == "en":
-            db.set_user_language(chat_id, "en")
-        else:
-            db.set_user_language(chat_id, language)
-
-    # Set activated to True
-    db.set_user_activated(chat_id, True)
-
-    first = get_config("telegram.jobs.first_run_delay", 10)
-
-    # Schedule first run
-    context.job_queue.run_once(
-        send_compliment,
-        when=timedelta(seconds=first),
-        chat_id=chat_id,
-        name=str(chat_id),
+        hour = _DEFAULT_HOUR
+    await asyncio.to_thread(
+        db.upsert_user, chat_id, hour=hour, language=language, activated=True
     )
 
-    # Schedule daily run at GMT time
-    context.job_queue.run_daily(
-        send_compliment,
-        time=time(hour=hour, minute=0),
-        chat_id=chat_id,
-        name=str(chat_id),
-    )
+    # Schedule first run
+    _schedule_first_run(context, chat_id, hour)
 
     await update.effective_message.reply_text(
         text=get_translation("messages.start", language)
@@ -64,14 +84,14 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def stop(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /stop command."""
     chat_id = update.effective_chat.id
-    db = DatabaseManager()
-    language = db.get_user_language(chat_id)
-    job_removed = remove_job_if_exists(str(chat_id), context)
-    # Set activated to False
-    db.set_user_activated(chat_id, False)
+    db = get_db()
+    _, language, was_activated = await asyncio.to_thread(db.get_user_settings, chat_id)
+    # Drop a pending first-run compliment; daily broadcasts skip deactivated users
+    remove_job_if_exists(str(chat_id), context)
+    await asyncio.to_thread(db.set_user_activated, chat_id, False)
     text = (
         get_translation("messages.stopping", language)
-        if job_removed
+        if was_activated
         else get_translation("messages.not_running", language)
     )
     await update.effective_message.reply_text(text=text)
@@ -80,8 +100,8 @@ async def stop(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def settime(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /settime command - Set the hour for receiving compliments (0-23 in GMT)."""
     chat_id = update.effective_chat.id
-    db = DatabaseManager()
-    language = db.get_user_language(chat_id)
+    db = get_db()
+    language = await asyncio.to_thread(db.get_user_language, chat_id)
 
     if not context.args or len(context.args) == 0:
         await update.effective_message.reply_text(
@@ -103,35 +123,18 @@ async def settime(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
 
-    # Update user hour
+    # Update user hour and activate user when they set a time (they want to
+    # receive compliments)
     try:
-        db.set_user_hour(chat_id, hour)
-        # Activate user when they set a time (they want to receive compliments)
-        db.set_user_activated(chat_id, True)
+        await asyncio.to_thread(db.upsert_user, chat_id, hour=hour, activated=True)
     except ValueError:
         await update.effective_message.reply_text(
             text=get_translation("messages.settime_invalid", language)
         )
         return
 
-    # Remove existing jobs and reschedule with new time
-    remove_job_if_exists(str(chat_id), context)
-
-    # Schedule daily run at GMT time
-    context.job_queue.run_daily(
-        send_compliment,
-        time=time(hour=hour, minute=0),
-        chat_id=chat_id,
-        name=str(chat_id),
-    )
-
     # Format hour for display
-    hour_display = f"{hour:02d}:00"
-    period = "AM" if hour < 12 else "PM"
-    hour_12 = hour if hour <= 12 else hour - 12
-    if hour == 0:
-        hour_12 = 12
-    display_time = f"{hour_12}:00 {period}"
+    hour_display, display_time = _HOUR_DISPLAY[hour]
 
     await update.effective_message.reply_text(
         text=format_translation(
@@ -146,9 +149,9 @@ async def settime(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def setlanguage(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /setlanguage command - Set the language for messages and compliments."""
     chat_id = update.effective_chat.id
-    db = DatabaseManager()
+    db = get_db()
     # Get current language for error messages
-    current_language = db.get_user_language(chat_id)
+    current_language = await asyncio.to_thread(db.get_user_language, chat_id)
 
     if not context.args or len(context.args) == 0:
         await update.effective_message.reply_text(
@@ -158,7 +161,7 @@ async def setlanguage(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     language_arg = context.args[0].lower()
 
-    if language_arg not in ("en", "ru"):
+    if language_arg not in SUPPORTED_LANGUAGES:
         await update.effective_message.reply_text(
             text=get_translation("messages.setlanguage_invalid", current_language)
         )
@@ -166,7 +169,7 @@ async def setlanguage(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     # Update user language
     try:
-        db.set_user_language(chat_id, language_arg)
+        await asyncio.to_thread(db.upsert_user, chat_id, language=language_arg)
         language_name = get_translation(f"language_names.{language_arg}", language_arg)
         await update.effective_message.reply_text(
             text=format_translation(
@@ -184,8 +187,8 @@ async def setlanguage(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def help(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /help command."""
     chat_id = update.effective_chat.id
-    db = DatabaseManager()
-    language = db.get_user_language(chat_id)
+    db = get_db()
+    language = await asyncio.to_thread(db.get_user_language, chat_id)
     await update.effective_message.reply_text(
         text=get_translation("messages.help", language)
     )
@@ -1,10 +1,14 @@
 """Job functions for scheduled tasks."""
 
-from datetime import datetime, timezone
-from telegram.ext import ContextTypes
-from setup import get_logger
-from db import DatabaseManager
-from translations import get_translation
+import asyncio
+import functools
+from datetime import date, datetime, time, timedelta, timezone
+from telegram import Bot
+from telegram.error import RetryAfter, TelegramError
+from telegram.ext import ContextTypes, JobQueue
+from setup import get_logger, get_int
+from db import get_db
+from translations import SUPPORTED_LANGUAGES, get_translation
 from compliment import ComplimentGenerator
 from news import FreshHeadlinesRetriever
 
@@ -13,17 +17,57 @@ logger = get_logger(__name__)
 # GMT timezone
 GMT = timezone.utc
 
+# Broadcast pacing defaults; resolve_broadcast_settings() overrides them from
+# telegram.broadcast in the config once at startup.
+# Telegram allows ~30 messages/second per bot; stay below it with a margin
+BROADCAST_RATE = 25
+BROADCAST_INTERVAL = 1.0
+BROADCAST_MAX_RETRIES = 3
+
+# (date, language) pairs currently being generated, so overlapping generation
+# jobs (startup run and daily run) don't both call the LLM for the same day
+_generating: set[tuple[date, str]] = set()
+
+# GMT date of the last compliment delivered to each chat, so a leftover
+# first-run job doesn't repeat a compliment the chat already got today
+_last_sent: dict[int, date] = {}
+
+
+def resolve_broadcast_settings() -> None:
+    """Read the broadcast settings from the loaded config.
+    Call once after setup_application()."""
+    global BROADCAST_RATE, BROADCAST_MAX_RETRIES
+    BROADCAST_RATE = get_int("telegram.broadcast.messages_per_second", BROADCAST_RATE)
+    BROADCAST_MAX_RETRIES = get_int(
+        "telegram.broadcast.max_retries", BROADCAST_MAX_RETRIES
+    )
+
+
+@functools.lru_cache(maxsize=1)
+def _get_news_client() -> FreshHeadlinesRetriever:
+    """Get the headlines retriever shared by all languages."""
+    return FreshHeadlinesRetriever()
+
+
+@functools.lru_cache(maxsize=4)
+def _get_generator(language: str) -> ComplimentGenerator:
+    """Get the long-lived compliment generator for a language."""
+    return ComplimentGenerator(_get_news_client(), language=language)
+
 
 async def send_compliment(context: ContextTypes.DEFAULT_TYPE):
-    """Send daily compliment to user."""
+    """Send daily compliment to user, unless it was already sent today."""
+    chat_id = context.job.chat_id
+    # Use GMT date
+    current_date = datetime.now(GMT).date()
+    if _last_sent.get(chat_id) == current_date:
+        return
     try:
-        db = DatabaseManager()
-        chat_id = context.job.chat_id
-        # Get user's language
-        language = db.get_user_language(chat_id)
-        # Use GMT date
-        current_date = datetime.now(GMT).date()
-        compliment = db.get_compliment(current_date, language)
+        db = get_db()
+        # Get user's language; DB calls run in a worker thread so the event
+        # loop keeps serving other updates
+        language = await asyncio.to_thread(db.get_user_language, chat_id)
+        compliment = await asyncio.to_thread(db.get_compliment, current_date, language)
         if not compliment:
             compliment = get_translation("messages.fallback_compliment", language)
     except Exception as e:
@@ -32,34 +76,163 @@ async def send_compliment(context: ContextTypes.DEFAULT_TYPE):
         compliment = get_translation("messages.fallback_compliment", language)
 
     await context.bot.send_message(chat_id=chat_id, text=compliment)
+    _last_sent[chat_id] = current_date
+
+
+async def _generate(language: str, current_date: date, headlines: list = None):
+    """Run the generator for a language and log the outcome."""
+    compliment = await _get_generator(language).generate_compliment_for_date(headlines)
+    if compliment:
+        logger.info(f"Generated {language} compliment for {current_date}: {compliment}")
+    else:
+        logger.warning(f"Failed to generate {language} compliment for {current_date}")
+    return compliment
 
 
-async def generate_compliment(context: ContextTypes.DEFAULT_TYPE, language: str = "en"):
-    """Generate compliment for a specific language."""
+async def generate_all_compliments(
+    context: ContextTypes.DEFAULT_TYPE,
+    languages: tuple = tuple(sorted(SUPPORTED_LANGUAGES)),
+):
+    """Generate today's compliments for all languages from one headlines fetch."""
     try:
-        db = DatabaseManager()
-        # Use GMT date
+        db = get_db()
         current_date = datetime.now(GMT).date()
+        # Claim before checking the DB, so a job that stores and releases its
+        # claim while this read is in flight can't be missed
+        claimed = [
+            language
+            for language in languages
+            if (current_date, language) not in _generating
+        ]
+        _generating.update((current_date, language) for language in claimed)
 
-        # Check if compliment already exists for today and language
-        existing_compliment = db.get_compliment(current_date, language)
-        if existing_compliment:
-            logger.info(
-                f"Compliment already exists for {current_date} ({language}), reusing existing one"
+        try:
+            existing = await asyncio.to_thread(
+                db.get_compliment_multi, current_date, tuple(claimed)
             )
-            return
+            pending = [language for language in claimed if language not in existing]
+            if not pending:
+                logger.info(
+                    f"Compliments already exist or are in progress for {current_date}, skipping"
+                )
+                return
 
-        # Generate new compliment if it doesn't exist
-        generator = ComplimentGenerator(FreshHeadlinesRetriever(), language=language)
-        compliment = generator.generate_compliment_for_date()
-        if compliment:
-            db.add_compliment(compliment, current_date, language)
-            logger.info(
-                f"Generated {language} compliment for {current_date}: {compliment}"
+            # Fetch once and share, instead of one NewsAPI call per language
+            headlines = await asyncio.to_thread(_get_news_client().get_headlines)
+            results = await asyncio.gather(
+                *(_generate(language, current_date, headlines) for language in pending),
+                return_exceptions=True,
             )
-        else:
-            logger.warning(
-                f"Failed to generate {language} compliment for {current_date}"
+            generated = {}
+            for language, result in zip(pending, results):
+                if isinstance(result, Exception):
+                    logger.error(f"Error generating {language} compliment: {result}")
+                elif result:
+                    generated[language] = result
+            if not generated:
+                return
+
+            # Store every language in one statement and transaction
+            await asyncio.to_thread(
+                db.add_compliments_bulk,
+                [
+                    (current_date, language, compliment)
+                    for language, compliment in generated.items()
+                ],
+            )
+        finally:
+            _generating.difference_update(
+                (current_date, language) for language in claimed
             )
     except Exception as e:
-        logger.error(f"Error generating {language} compliment: {e}")
+        logger.error(f"Error generating compliments: {e}")
+
+
+async def _send_with_retry(bot: Bot, chat_id: int, text: str) -> bool:
+    """Send a message, backing off on flood control. Returns whether it was sent."""
+    for attempt in range(BROADCAST_MAX_RETRIES):
+        try:
+            await bot.send_message(chat_id=chat_id, text=text)
+            return True
+        except RetryAfter as e:
+            if attempt == BROADCAST_MAX_RETRIES - 1:
+                # No attempt left to wait for
+                break
+            retry_after = e.retry_after
+            if isinstance(retry_after, timedelta):
+                retry_after = retry_after.total_seconds()
+            delay = max(retry_after, BROADCAST_INTERVAL * 2**attempt)
+            logger.warning(f"Flood control for {chat_id}, retrying in {delay}s")
+            await asyncio.sleep(delay)
+        except TelegramError as e:
+            logger.error(f"Error sending compliment to {chat_id}: {e}")
+            return False
+    logger.error(f"Giving up sending compliment to {chat_id} after retries")
+    return False
+
+
+async def broadcast_compliments(context: ContextTypes.DEFAULT_TYPE):
+    """Send today's compliment to every activated user of the job's hour."""
+    hour = context.job.data
+    try:
+        db = get_db()
+        current_date = datetime.now(GMT).date()
+        # Users and their language's compliment come back from a single query,
+        # run off the event loop
+        grouped = await asyncio.to_thread(
+            db.get_activated_users_with_compliment, current_date, hour
+        )
+        users = grouped.get(hour, [])
+        if not users:
+            return
+    except Exception as e:
+        logger.error(f"Error preparing broadcast for {hour:02d}:00 GMT: {e}")
+        return
+
+    logger.info(
+        f"Broadcasting compliments to {len(users)} user(s) at {hour:02d}:00 GMT"
+    )
+    # Each send holds one of `rate` slots for at least an interval, so at most
+    # `rate` sends start per interval while slow sends don't stall the rest
+    semaphore = asyncio.Semaphore(BROADCAST_RATE)
+    loop = asyncio.get_running_loop()
+
+    async def send(chat_id: int, language: str, compliment: str | None) -> bool:
+        async with semaphore:
+            started = loop.time()
+            try:
+                sent = await _send_with_retry(
+                    context.bot,
+                    chat_id,
+                    compliment
+                    or get_translation("messages.fallback_compliment", language),
+                )
+                if sent:
+                    _last_sent[chat_id] = current_date
+                return sent
+            finally:
+                await asyncio.sleep(BROADCAST_INTERVAL - (loop.time() - started))
+
+    results = await asyncio.gather(
+        *(send(*user) for user in users), return_exceptions=True
+    )
+    sent = 0
+    for (chat_id, _, _), result in zip(users, results):
+        if isinstance(result, Exception):
+            logger.error(f"Error sending compliment to {chat_id}: {result}")
+        else:
+            sent += result
+    logger.info(f"Broadcast at {hour:02d}:00 GMT delivered {sent}/{len(users)}")
+
+
+def schedule_broadcast(job_queue: JobQueue, hour: int) -> None:
+    """Schedule the daily broadcast for a GMT hour unless it is already scheduled."""
+    name = f"broadcast_{hour:02d}"
+    if job_queue.get_jobs_by_name(name):
+        return
+    job_queue.run_daily(
+        broadcast_compliments,
+        time=time(hour=hour, minute=0),
+        name=name,
+        data=hour,
+    )
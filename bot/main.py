@@ -3,10 +3,15 @@
 import os
 from datetime import time, timedelta
 from telegram.ext import ApplicationBuilder, CommandHandler, Defaults
-from setup import setup_application, get_logger, get_config
-from bot.handlers import start, stop, help, settime, setlanguage
-from bot.jobs import generate_compliment, send_compliment, GMT
-from db import DatabaseManager
+from setup import setup_application, get_logger, get_int
+from bot.handlers import start, stop, help, settime, setlanguage, resolve_constants
+from bot.jobs import (
+    generate_all_compliments,
+    resolve_broadcast_settings,
+    schedule_broadcast,
+    GMT,
+)
+from db import get_db
 
 logger = get_logger(__name__)
 
@@ -14,6 +19,12 @@ logger = get_logger(__name__)
 def main():
     """Initialize and run the Telegram bot."""
     setup_application()
+    resolve_constants()
+    resolve_broadcast_settings()
+
+    # Create tables and run migrations once, before any handler touches the DB
+    db = get_db()
+    db.init_schema()
 
     # Set timezone defaults for the application (GMT/UTC)
     defaults = Defaults(tzinfo=GMT)
@@ -29,60 +40,32 @@ def main():
     application.add_handler(CommandHandler("setlanguage", setlanguage))
 
     # Schedule compliment generation for both languages at GMT time
-    generate_hour = get_config("telegram.jobs.generate_hour", 0)
-    generate_minute = get_config("telegram.jobs.generate_minute", 0)
-    first_delay = get_config("telegram.jobs.first_run_delay", 10)
-
-    # Create wrapper functions for each language
-    async def generate_en(context):
-        await generate_compliment(context, "en")
-
-    async def generate_ru(context):
-        await generate_compliment(context, "ru")
+    generate_hour = get_int("telegram.jobs.generate_hour", 0)
+    generate_minute = get_int("telegram.jobs.generate_minute", 0)
+    first_delay = get_int("telegram.jobs.first_run_delay", 10)
 
-    # Schedule initial generation for English
+    # Schedule initial generation; both languages share one headlines fetch
+    # and generate concurrently
     application.job_queue.run_once(
-        generate_en,
+        generate_all_compliments,
         when=timedelta(seconds=first_delay),
-        name="generate_compliment_en_init",
-    )
-    # Schedule daily generation for English
-    application.job_queue.run_daily(
-        generate_en,
-        time=time(hour=generate_hour, minute=generate_minute),
-        name="generate_compliment_en",
+        name="generate_compliments_init",
     )
-
-    # Schedule initial generation for Russian
-    # Use longer delay to ensure English job completes first (generation takes ~5-10 seconds)
-    application.job_queue.run_once(
-        generate_ru,
-        when=timedelta(seconds=first_delay + 15),  # Longer delay to avoid conflicts
-        name="generate_compliment_ru_init",
-    )
-    # Schedule daily generation for Russian
+    # Schedule daily generation
     application.job_queue.run_daily(
-        generate_ru,
+        generate_all_compliments,
         time=time(hour=generate_hour, minute=generate_minute),
-        name="generate_compliment_ru",
+        name="generate_compliments",
     )
 
-    # Schedule jobs for all activated users on startup
-    db = DatabaseManager()
-    activated_users = db.get_activated_users()
-    logger.info(f"Found {len(activated_users)} activated user(s), scheduling jobs...")
+    # One broadcast timer per GMT hour; each fans out to that hour's users
+    for hour in range(24):
+        schedule_broadcast(application.job_queue, hour)
 
-    for user in activated_users:
-        chat_id = user["chat_id"]
-        hour = user["hour"]
-        # Schedule daily run at GMT time for each activated user
-        application.job_queue.run_daily(
-            send_compliment,
-            time=time(hour=hour, minute=0),
-            chat_id=chat_id,
-            name=str(chat_id),
-        )
-        logger.info(f"Scheduled job for user {chat_id} at {hour:02d}:00 GMT")
+    logger.info(
+        f"Scheduled 24 hourly broadcasts for "
+        f"{db.count_activated_users()} activated user(s)"
+    )
 
     application.run_polling()
 
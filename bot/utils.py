@@ -1,20 +1,53 @@
 """Utility functions for the Telegram bot."""
 
-from telegram.ext import ContextTypes
+from contextlib import suppress
+from datetime import timedelta
+from telegram.ext import ContextTypes, Job
+
+# Pending one-off job by name, so lookups by name don't scan every
+# job in the queue; entries are dropped when a job runs or is removed
+_JOBS: dict[str, Job] = {}
+
+
+def schedule_once(
+    context: ContextTypes.DEFAULT_TYPE,
+    callback,
+    when: timedelta,
+    name: str,
+    **kwargs,
+) -> Job:
+    """Schedule a one-off job under a name and record it in the job index.
+    The name doubles as the scheduler job id, so a pending job with the same
+    name is replaced in place instead of being looked up and removed first."""
+
+    async def run_and_forget(job_context: ContextTypes.DEFAULT_TYPE):
+        if _JOBS.get(name) is job_context.job:
+            del _JOBS[name]
+        await callback(job_context)
+
+    job = context.job_queue.run_once(
+        run_and_forget,
+        when=when,
+        name=name,
+        job_kwargs={"id": name, "replace_existing": True},
+        **kwargs,
+    )
+    _JOBS[name] = job
+    return job
 
 
 def job_exists(name: str, context: ContextTypes.DEFAULT_TYPE) -> bool:
     """Check if a job with the given name exists."""
-    current_jobs = context.job_queue.get_jobs_by_name(name)
-    return len(current_jobs) > 0
+    return name in _JOBS
 
 
 def remove_job_if_exists(name: str, context: ContextTypes.DEFAULT_TYPE) -> bool:
     """Remove job with given name. Returns whether job was removed."""
-    current_jobs = context.job_queue.get_jobs_by_name(name)
-    if not current_jobs:
+    job = _JOBS.pop(name, None)
+    if job is None:
         return False
-    for job in current_jobs:
+    # The job may have fired between lookup and removal
+    with suppress(LookupError):
         job.schedule_removal()
     return True
 
@@ -1,17 +1,28 @@
+import asyncio
+import functools
 from typing import List
 
+import httpx
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables import RunnableParallel, RunnableLambda
 from pydantic import BaseModel, Field
 
 from news import FreshHeadlinesRetriever
-from setup import get_logger, get_config
+from setup import get_logger, get_float, get_int, get_str
 from translations import get_translation
 
 logger = get_logger(__name__)
 
 
+@functools.lru_cache(maxsize=1)
+def _get_http_client() -> httpx.AsyncClient:
+    """Shared async HTTP client for all LLM calls, so every language and
+    headline reuses the same keep-alive connections to the API."""
+    return httpx.AsyncClient(
+        limits=httpx.Limits(max_keepalive_connections=10, keepalive_expiry=3600)
+    )
+
+
 class ComplimentModel(BaseModel):
     """The funniest compliment based on recent news."""
 
@@ -28,55 +39,52 @@ class ComplimentGenerator:
     ):
         self.news_client = news_client
         self.language = language
-        # Use config defaults if not provided
-        llm_model = llm_model or get_config("llm.model", "gpt-4o-mini")
-        llm_temperature = llm_temperature or get_config("llm.temperature", 0.7)
-
+        # Use config defaults if not provided; read here rather than at import
+        # so the config passed to setup_application() is the one used
+        self.llm_model = llm_model or get_str("llm.model", "gpt-4o-mini")
+        self.llm_temperature = llm_temperature or get_float("llm.temperature", 0.7)
+        # Upper bound on concurrent per-headline LLM calls
+        self.max_concurrency = get_int("llm.max_concurrency", 5)
+
+    # The LLM client and chains are built lazily on first use and then reused,
+    # so constructing a generator is cheap and works without an API key.
+    @functools.cached_property
+    def llm(self) -> ChatOpenAI | None:
         try:
-            self.llm = ChatOpenAI(model=llm_model, temperature=llm_temperature)
+            return ChatOpenAI(
+                model=self.llm_model,
+                temperature=self.llm_temperature,
+                http_async_client=_get_http_client(),
+            )
         except Exception as e:
             logger.error(f"Error initializing ChatOpenAI: {e}")
-            self.llm = None
-        self._setup_chains()
+            return None
+
+    @functools.cached_property
+    def single_compliment_chain(self):
+        return self._build_chain("prompts.system_compliment", "prompts.user_compliment")
+
+    @functools.cached_property
+    def select_best_compliment_chain(self):
+        return self._build_chain("prompts.system_select", "prompts.user_select")
 
-    def _setup_chains(self):
+    def _build_chain(self, system_key: str, user_key: str):
         if self.llm is None:
-            self.single_compliment_chain = None
-            self.select_best_compliment_chain = None
-            return
+            return None
         try:
             # Get prompts from translations
-            system_compliment_prompt = get_translation(
-                "prompts.system_compliment", self.language
-            )
-            user_compliment_prompt = get_translation(
-                "prompts.user_compliment", self.language
-            )
-
-            self.single_compliment_chain = ChatPromptTemplate.from_messages(
-                [
-                    ("system", system_compliment_prompt),
-                    ("user", user_compliment_prompt),
-                ]
-            ) | self.llm.with_structured_output(ComplimentModel)
+            system_prompt = get_translation(system_key, self.language)
+            user_prompt = get_translation(user_key, self.language)
 
-            # Get system_select prompt from translations
-            system_select_prompt = get_translation(
-                "prompts.system_select", self.language
-            )
-
-            user_select_prompt = get_translation("prompts.user_select", self.language)
-
-            self.select_best_compliment_chain = ChatPromptTemplate.from_messages(
+            return ChatPromptTemplate.from_messages(
                 [
-                    ("system", system_select_prompt),
-                    ("user", user_select_prompt),
+                    ("system", system_prompt),
+                    ("user", user_prompt),
                 ]
             ) | self.llm.with_structured_output(ComplimentModel)
         except Exception as e:
             logger.error(f"Error setting up chains: {e}")
-            self.single_compliment_chain = None
-            self.select_best_compliment_chain = None
+            return None
 
     @staticmethod
     def _extract_title_desc(headline):
@@ -90,11 +98,10 @@ class ComplimentGenerator:
             return {"title": "", "description": ""}
 
     @staticmethod
-    def _join_compliments(results):
+    def _join_compliments(results: List):
         try:
             parts = []
-            for i in range(len(results)):
-                compliment_obj = results.get(f"compliment_{i}")
+            for i, compliment_obj in enumerate(results):
                 compliment_text = getattr(compliment_obj, "compliment", None)
                 if compliment_text is None and isinstance(compliment_obj, dict):
                     compliment_text = compliment_obj.get("compliment", "")
@@ -113,9 +120,20 @@ class ComplimentGenerator:
             logger.error(f"Error getting headlines: {e}")
             return []
 
-    def generate_compliment_for_date(self) -> str | None:
+    async def _generate_single(self, headline, semaphore: asyncio.Semaphore):
+        async with semaphore:
+            return await self.single_compliment_chain.ainvoke(
+                self._extract_title_desc(headline)
+            )
+
+    async def generate_compliment_for_date(
+        self, headlines: List | None = None
+    ) -> str | None:
+        """Generate today's compliment, optionally from preloaded headlines."""
         try:
-            headlines = self._get_headlines()
+            if headlines is None:
+                # NewsAPI client is blocking; keep it off the event loop
+                headlines = await asyncio.to_thread(self._get_headlines)
             if not headlines:
                 logger.warning("No news headlines available to generate compliment.")
                 return None
@@ -127,28 +145,24 @@ class ComplimentGenerator:
                 logger.error("LLM chains are not properly initialized.")
                 return None
 
-            compliment_chains = {
-                f"compliment_{i}": (
-                    RunnableLambda(lambda d, i=i: d.get(f"headline_{i}"))
-                    | RunnableLambda(self._extract_title_desc)
-                    | self.single_compliment_chain
-                )
-                for i in range(len(headlines))
-            }
-
-            parallel_chain = RunnableParallel(**compliment_chains)
-
-            chain = (
-                parallel_chain
-                | RunnableLambda(self._join_compliments)
-                | self.select_best_compliment_chain
-            )
-
-            input_dict = {
-                f"headline_{i}": headline for i, headline in enumerate(headlines)
-            }
+            semaphore = asyncio.Semaphore(self.max_concurrency)
             try:
-                result = chain.invoke(input_dict)
+                results = await asyncio.gather(
+                    *(self._generate_single(h, semaphore) for h in headlines),
+                    return_exceptions=True,
+                )
+                compliments = []
+                for result in results:
+                    if isinstance(result, Exception):
+                        logger.error(f"Error generating single compliment: {result}")
+                    else:
+                        compliments.append(result)
+                if not compliments:
+                    logger.warning("No single compliments generated by the LLM.")
+                    return None
+
+                joined = self._join_compliments(compliments)
+                result = await self.select_best_compliment_chain.ainvoke(joined)
             except Exception as e:
                 logger.error(f"Error invoking LLM chain: {e}")
                 return None
@@ -5,7 +5,14 @@ This module is kept for backward compatibility.
 Please use 'from db import DatabaseManager' instead.
 """
 
-# Import from new location for backward compatibility
-from db import DatabaseManager, Base, Compliment, UserSettings
+import warnings
 
-__all__ = ["DatabaseManager", "Base", "Compliment", "UserSettings"]
+# Re-export the db package; nothing here creates an engine or a second schema
+from db import *  # noqa: F401,F403
+from db import __all__  # noqa: F401
+
+warnings.warn(
+    "The 'database' module is deprecated; import from 'db' instead.",
+    DeprecationWarning,
+    stacklevel=2,
+)
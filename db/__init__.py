@@ -1,6 +1,6 @@
 """Database package for the compliment bot."""
 
 from db.models import Base, Compliment, UserSettings
-from db.manager import DatabaseManager
+from db.manager import DatabaseManager, get_db
 
-__all__ = ["Base", "Compliment", "UserSettings", "DatabaseManager"]
+__all__ = ["Base", "Compliment", "UserSettings", "DatabaseManager", "get_db"]
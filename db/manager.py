@@ -1,15 +1,73 @@
 """Database manager for the compliment bot."""
 
 import datetime
+import functools
+import importlib.util
 import os
-from sqlalchemy import create_engine
+from itertools import groupby
+from operator import itemgetter
+from contextlib import contextmanager
+from typing import Iterator
+from sqlalchemy import and_, bindparam, create_engine, func, make_url, select, text
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import sessionmaker
-from setup import get_logger
-from db.models import Base, Compliment, UserSettings
-from db.migrations import migrate_add_missing_columns
+from setup import get_logger, get_int
+from cache import TTLCache
+from translations import SUPPORTED_LANGUAGES
+from db.models import Compliment, UserSettings
+from db.migrations import migrate_schema
 
 logger = get_logger(__name__)
 
+# Hot-path reads bypass the ORM; built once so every call hits the
+# compiled-statement cache
+_SELECT_COMPLIMENT = select(Compliment.content).where(
+    Compliment.date == bindparam("date"),
+    Compliment.language == bindparam("language"),
+)
+_SELECT_USER_LANGUAGE = select(UserSettings.language).where(
+    UserSettings.chat_id == bindparam("chat_id")
+)
+_SELECT_USER_HOUR = select(UserSettings.hour).where(
+    UserSettings.chat_id == bindparam("chat_id")
+)
+_SELECT_USER_SETTINGS = select(
+    UserSettings.hour, UserSettings.language, UserSettings.activated
+).where(UserSettings.chat_id == bindparam("chat_id"))
+_SELECT_COMPLIMENTS = select(Compliment.language, Compliment.content).where(
+    Compliment.date == bindparam("date"),
+    Compliment.language.in_(bindparam("languages", expanding=True)),
+)
+
+# Rows fetched per round-trip when streaming user lists from a server-side cursor
+_STREAM_BATCH = 1000
+
+# psycopg 3 is optional; the locked dependency is psycopg2
+_HAS_PSYCOPG3 = importlib.util.find_spec("psycopg") is not None
+
+# Set once the schema has been created and migrated in this process
+_SCHEMA_READY = False
+
+
+def _log_errors(action: str):
+    """Decorate a write method to log any error as "Error <action>" and re-raise."""
+
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            try:
+                return method(*args, **kwargs)
+            except ValueError:
+                # Invalid arguments are the caller's to report
+                raise
+            except Exception as e:
+                logger.error(f"Error {action}: {e}")
+                raise
+
+        return wrapper
+
+    return decorator
+
 
 class DatabaseManager:
     """Manages database connections and operations."""
@@ -33,165 +91,335 @@ class DatabaseManager:
         if database_url.startswith("postgres://"):
             database_url = database_url.replace("postgres://", "postgresql://", 1)
 
-        # Create synchronous engine
-        self.engine = create_engine(database_url, pool_pre_ping=True)
+        # Prefer psycopg 3 (binary protocol, C decoder) when it is installed;
+        # otherwise the plain scheme keeps using psycopg2
+        if _HAS_PSYCOPG3 and database_url.startswith("postgresql://"):
+            database_url = database_url.replace(
+                "postgresql://", "postgresql+psycopg://", 1
+            )
+
+        # psycopg2 batches executemany() into multi-row VALUES
+        engine_options = {}
+        if make_url(database_url).get_driver_name() == "psycopg2":
+            engine_options["executemany_mode"] = "values_plus_batch"
+
+        # Create synchronous engine; the QueuePool keeps connections warm
+        # across handler calls instead of reconnecting per query, and the
+        # compiled-statement cache is sized so hot queries never get evicted
+        self.engine = create_engine(
+            database_url,
+            pool_size=get_int("database.pool_size", 10),
+            max_overflow=get_int("database.max_overflow", 20),
+            pool_pre_ping=True,
+            pool_recycle=get_int("database.pool_recycle", 1800),
+            query_cache_size=get_int("database.query_cache_size", 1200),
+            **engine_options,
+        )
 
         # Create sessionmaker with bind to engine
         self.SessionLocal = sessionmaker(
-            autocommit=False, autoflush=False, bind=self.engine
+            autocommit=False, autoflush=False, expire_on_commit=False, bind=self.engine
         )
 
-        # Initialize database tables
-        Base.metadata.create_all(bind=self.engine)
+        # Each day's compliment per language is read by every user, so keep it
+        # for the day; per-chat settings expire so other writers show up
+        self._compliment_cache = TTLCache(maxsize=4, ttl=86400)
+        # Per-chat settings caches; setters write through after commit
+        self._lang_cache = TTLCache(maxsize=4096, ttl=300)
+        self._hour_cache = TTLCache(maxsize=4096, ttl=300)
 
-        # Run migrations to add any missing columns from models
-        migrate_add_missing_columns(self.engine)
+    def init_schema(self) -> None:
+        """Create missing tables and columns. Call once at application startup;
+        later calls in the same process are no-ops."""
+        global _SCHEMA_READY
+        if _SCHEMA_READY:
+            return
+
+        with self._migration_lock():
+            migrate_schema(self.engine)
+        _SCHEMA_READY = True
+
+    @contextmanager
+    def _migration_lock(self):
+        """Hold a PostgreSQL advisory lock so concurrently starting processes
+        don't run the same DDL at once."""
+        if self.engine.dialect.name != "postgresql":
+            yield
+            return
+        with self.engine.connect() as conn:
+            conn.execute(
+                text("SELECT pg_advisory_lock(hashtext('compliment_migration'))")
+            )
+            try:
+                yield
+            finally:
+                conn.execute(
+                    text("SELECT pg_advisory_unlock(hashtext('compliment_migration'))")
+                )
 
+    def _update_caches(
+        self, chat_id: int, hour: int = None, language: str = None
+    ) -> None:
+        """Write the given settings through to the per-chat caches."""
+        if hour is not None:
+            self._hour_cache[chat_id] = hour
+        if language is not None:
+            self._lang_cache[chat_id] = language
+
+    @_log_errors("adding compliment")
     def add_compliment(
-        self, compliment_content: str, date: datetime.date, language: str
+        self,
+        compliment_content: str,
+        date: datetime.date,
+        language: str,
     ) -> None:
         """Add a compliment for a specific date and language."""
-        db = self.SessionLocal()
-        try:
+        # Session.begin() commits on success, rolls back on error and closes
+        with self.SessionLocal.begin() as db:
             db.add(Compliment(content=compliment_content, date=date, language=language))
-            db.commit()
-        except Exception as e:
-            logger.error(f"Error adding compliment: {e}")
-            db.rollback()
-            raise
-        finally:
-            db.close()
+        self._compliment_cache[(date, language)] = compliment_content
+
+    @_log_errors("adding compliments")
+    def add_compliments_bulk(self, items: list[tuple[datetime.date, str, str]]) -> None:
+        """Add many compliments given as (date, language, content) in one
+        executemany, which psycopg2 batches into multi-row INSERTs. Rows whose
+        date and language already exist are skipped rather than failing the
+        batch, so a concurrent writer's compliment is kept."""
+        if not items:
+            return
+        rows = [
+            {"date": date, "language": language, "content": content}
+            for date, language, content in items
+        ]
+        stmt = (
+            insert(Compliment)
+            .on_conflict_do_nothing(index_elements=["date", "language"])
+            .returning(Compliment.date, Compliment.language)
+        )
+        with self.SessionLocal.begin() as db:
+            inserted = set(db.execute(stmt, rows).tuples())
+        for date, language, content in items:
+            if (date, language) in inserted:
+                self._compliment_cache[(date, language)] = content
+            else:
+                self._compliment_cache.pop((date, language))
 
     def get_compliment(self, date: datetime.date, language: str) -> str | None:
         """Get a compliment for a specific date and language."""
-        db = self.SessionLocal()
+        compliment = self._compliment_cache.get((date, language))
+        if compliment is not None:
+            return compliment
         try:
-            compliment = (
-                db.query(Compliment)
-                .filter(Compliment.date == date, Compliment.language == language)
-                .first()
-            )
-            return compliment.content if compliment else None
+            with self.engine.connect() as conn:
+                compliment = conn.execute(
+                    _SELECT_COMPLIMENT, {"date": date, "language": language}
+                ).scalar()
+            # Missing compliments aren't cached; they may be generated any time
+            if compliment:
+                self._compliment_cache[(date, language)] = compliment
+            return compliment
         except Exception as e:
             logger.error(f"Error getting compliment: {e}")
             return None
-        finally:
-            db.close()
+
+    def get_compliment_multi(
+        self, date: datetime.date, languages: tuple[str, ...]
+    ) -> dict[str, str]:
+        """Get the compliments for several languages on a date in one query.
+        Returns {language: content} for the languages that have one."""
+        compliments = {}
+        missing = []
+        for language in languages:
+            compliment = self._compliment_cache.get((date, language))
+            if compliment is not None:
+                compliments[language] = compliment
+            else:
+                missing.append(language)
+        if not missing:
+            return compliments
+        try:
+            with self.engine.connect() as conn:
+                rows = conn.execute(
+                    _SELECT_COMPLIMENTS, {"date": date, "languages": missing}
+                )
+                for language, compliment in rows:
+                    if compliment:
+                        compliments[language] = compliment
+                        self._compliment_cache[(date, language)] = compliment
+        except Exception as e:
+            logger.error(f"Error getting compliments: {e}")
+        return compliments
+
+    def get_user_settings(self, chat_id: int) -> tuple[int | None, str, bool]:
+        """Get user's hour (None if not set), language (default 'en') and
+        activated status in one query, refreshing the settings caches."""
+        try:
+            with self.engine.connect() as conn:
+                row = conn.execute(_SELECT_USER_SETTINGS, {"chat_id": chat_id}).first()
+        except Exception as e:
+            logger.error(f"Error getting user settings: {e}")
+            return None, "en", False
+        if row is None:
+            return None, "en", False
+        hour, language = row.hour, row.language or "en"
+        self._update_caches(chat_id, hour=hour, language=language)
+        return hour, language, bool(row.activated)
 
     def get_user_language(self, chat_id: int) -> str:
-        """Get user's preferred language ('en' or 'ru'), default is 'en'."""
-        db = self.SessionLocal()
+        """Get user's preferred language (one of SUPPORTED_LANGUAGES), default is 'en'."""
+        language = self._lang_cache.get(chat_id)
+        if language is not None:
+            return language
         try:
-            user_settings = (
-                db.query(UserSettings).filter(UserSettings.chat_id == chat_id).first()
-            )
-            return (
-                user_settings.language
-                if user_settings and user_settings.language
-                else "en"
-            )
+            with self.engine.connect() as conn:
+                language = (
+                    conn.execute(_SELECT_USER_LANGUAGE, {"chat_id": chat_id}).scalar()
+                    or "en"
+                )
+            self._lang_cache[chat_id] = language
+            return language
         except Exception as e:
             logger.error(f"Error getting user language: {e}")
             return "en"
-        finally:
-            db.close()
 
     def set_user_language(self, chat_id: int, language: str) -> None:
-        """Set user's preferred language ('en' or 'ru')."""
-        if language not in ("en", "ru"):
-            raise ValueError(f"Language must be 'en' or 'ru', got {language}")
-        db = self.SessionLocal()
-        try:
-            user_settings = (
-                db.query(UserSettings).filter(UserSettings.chat_id == chat_id).first()
-            )
-            if user_settings:
-                user_settings.language = language
-            else:
-                db.add(UserSettings(chat_id=chat_id, language=language))
-            db.commit()
-        except Exception as e:
-            logger.error(f"Error setting user language: {e}")
-            db.rollback()
-            raise
-        finally:
-            db.close()
+        """Set user's preferred language (one of SUPPORTED_LANGUAGES)."""
+        self.upsert_user(chat_id, language=language)
 
     def get_user_hour(self, chat_id: int) -> int | None:
         """Get user's preferred hour (0-23) in GMT or None if not set."""
-        db = self.SessionLocal()
+        hour = self._hour_cache.get(chat_id)
+        if hour is not None:
+            return hour
         try:
-            user_settings = (
-                db.query(UserSettings).filter(UserSettings.chat_id == chat_id).first()
-            )
-            return user_settings.hour if user_settings else None
+            with self.engine.connect() as conn:
+                hour = conn.execute(_SELECT_USER_HOUR, {"chat_id": chat_id}).scalar()
+            # Only existing users are cached; None means "not registered yet"
+            if hour is not None:
+                self._hour_cache[chat_id] = hour
+            return hour
         except Exception as e:
             logger.error(f"Error getting user hour: {e}")
             return None
-        finally:
-            db.close()
 
     def set_user_hour(self, chat_id: int, hour: int) -> None:
         """Set user's preferred hour (0-23) in GMT."""
-        if not (0 <= hour <= 23):
-            raise ValueError(f"Hour must be between 0 and 23, got {hour}")
-        db = self.SessionLocal()
-        try:
-            user_settings = (
-                db.query(UserSettings).filter(UserSettings.chat_id == chat_id).first()
-            )
-            if user_settings:
-                user_settings.hour = hour
-            else:
-                db.add(UserSettings(chat_id=chat_id, hour=hour, language="en"))
-            db.commit()
-        except Exception as e:
-            logger.error(f"Error setting user hour: {e}")
-            db.rollback()
-            raise
-        finally:
-            db.close()
+        self.upsert_user(chat_id, hour=hour)
 
     def set_user_activated(self, chat_id: int, activated: bool) -> None:
         """Set user's activated status."""
-        db = self.SessionLocal()
+        self.upsert_user(chat_id, activated=activated)
+
+    @_log_errors("upserting user settings")
+    def upsert_user(
+        self,
+        chat_id: int,
+        hour: int | None = None,
+        language: str | None = None,
+        activated: bool | None = None,
+    ) -> None:
+        """Create or update user settings with a single INSERT ... ON CONFLICT.
+        Only the given fields are changed for an existing user; a new user gets
+        model defaults for the rest."""
+        if hour is not None and not (0 <= hour <= 23):
+            raise ValueError(f"Hour must be between 0 and 23, got {hour}")
+        if language is not None and language not in SUPPORTED_LANGUAGES:
+            raise ValueError(
+                f"Language must be one of {', '.join(sorted(SUPPORTED_LANGUAGES))}, "
+                f"got {language}"
+            )
+        values = {
+            name: value
+            for name, value in (
+                ("hour", hour),
+                ("language", language),
+                ("activated", activated),
+            )
+            if value is not None
+        }
+        stmt = insert(UserSettings).values(chat_id=chat_id, **values)
+        if values:
+            stmt = stmt.on_conflict_do_update(index_elements=["chat_id"], set_=values)
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=["chat_id"])
+        # Return the stored row so both cached settings are refreshed without
+        # a follow-up SELECT
+        stmt = stmt.returning(UserSettings.hour, UserSettings.language)
+        with self.SessionLocal.begin() as db:
+            row = db.execute(stmt).first()
+        if row is not None:
+            hour, language = row.hour, row.language or "en"
+        self._update_caches(chat_id, hour=hour, language=language)
+
+    def get_activated_users(self) -> Iterator[dict]:
+        """Iterate over all activated users with their settings.
+        Yields dictionaries with chat_id, hour, and language, streamed from the
+        server in batches so memory stays flat as the user base grows."""
+        stmt = select(
+            UserSettings.chat_id, UserSettings.hour, UserSettings.language
+        ).where(UserSettings.activated)
         try:
-            user_settings = (
-                db.query(UserSettings).filter(UserSettings.chat_id == chat_id).first()
+            with self.engine.connect() as conn:
+                rows = conn.execution_options(yield_per=_STREAM_BATCH).execute(stmt)
+                for row in rows:
+                    yield dict(row._mapping)
+        except Exception as e:
+            logger.error(f"Error getting activated users: {e}")
+
+    def get_activated_users_with_compliment(
+        self, date: datetime.date, hour: int | None = None
+    ) -> dict[int, list[tuple[int, str, str | None]]]:
+        """Get activated users, optionally only those of one hour, together with
+        the compliment for their language on the given date, in one query.
+        Returns {hour: [(chat_id, language, content or None), ...]}."""
+        # Users without a language get English, both in the result and when
+        # picking their compliment
+        language = func.coalesce(UserSettings.language, "en")
+        stmt = (
+            select(
+                UserSettings.hour,
+                UserSettings.chat_id,
+                language,
+                Compliment.content,
             )
-            if user_settings:
-                user_settings.activated = activated
-            else:
-                # If user doesn't exist, create with default values
-                default_hour = 8
-                db.add(
-                    UserSettings(
-                        chat_id=chat_id,
-                        hour=default_hour,
-                        language="en",
-                        activated=activated,
-                    )
-                )
-            db.commit()
+            .outerjoin(
+                Compliment,
+                and_(Compliment.date == date, Compliment.language == language),
+            )
+            .where(UserSettings.activated)
+            .order_by(UserSettings.hour, UserSettings.chat_id)
+        )
+        if hour is not None:
+            stmt = stmt.where(UserSettings.hour == hour)
+        try:
+            with self.engine.connect() as conn:
+                # Rows stream in hour order, so each bucket is one contiguous run
+                rows = conn.execution_options(yield_per=_STREAM_BATCH).execute(stmt)
+                return {
+                    user_hour: [
+                        (chat_id, language, content)
+                        for _, chat_id, language, content in group
+                    ]
+                    for user_hour, group in groupby(rows, key=itemgetter(0))
+                }
         except Exception as e:
-            logger.error(f"Error setting user activated status: {e}")
-            db.rollback()
-            raise
-        finally:
-            db.close()
-
-    def get_activated_users(self) -> list[dict]:
-        """Get all activated users with their settings.
-        Returns a list of dictionaries with chat_id, hour, and language."""
-        db = self.SessionLocal()
+            logger.error(f"Error getting activated users with compliments: {e}")
+            return {}
+
+    def count_activated_users(self) -> int:
+        """Count activated users with a single COUNT(*)."""
+        stmt = (
+            select(func.count()).select_from(UserSettings).where(UserSettings.activated)
+        )
         try:
-            users = db.query(UserSettings).filter(UserSettings.activated).all()
-            return [
-                {"chat_id": user.chat_id, "hour": user.hour, "language": user.language}
-                for user in users
-            ]
+            with self.engine.connect() as conn:
+                return conn.execute(stmt).scalar_one()
         except Exception as e:
-            logger.error(f"Error getting activated users: {e}")
-            return []
-        finally:
-            db.close()
+            logger.error(f"Error counting activated users: {e}")
+            return 0
+
+
+@functools.lru_cache(maxsize=1)
+def get_db() -> DatabaseManager:
+    """Get the shared DatabaseManager instance (one engine and pool per process)."""
+    return DatabaseManager()
@@ -1,31 +1,151 @@
 """Database migration utilities."""
 
-from sqlalchemy import Column, String, Integer, BigInteger, Date, text, inspect
+import functools
+import hashlib
+from sqlalchemy import (
+    Column,
+    String,
+    Integer,
+    BigInteger,
+    Date,
+    DateTime,
+    MetaData,
+    Table,
+    func,
+    insert,
+    inspect,
+    select,
+    text,
+)
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateIndex
+from sqlalchemy.sql.elements import TextClause
 from setup import get_logger
 from db.models import Base
 
 logger = get_logger(__name__)
 
+# Fingerprint of the model schema the database was last migrated to; kept out
+# of Base.metadata so it never affects the fingerprint itself
+_schema_cache = Table(
+    "_schema_cache",
+    MetaData(),
+    Column("fingerprint", String, primary_key=True),
+    Column("applied_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+# Per model table: (table, {column name: column}, {primary key column names}).
+# Models are declared at import, so this is built once per process
+_MODEL_META = {
+    name: (
+        table,
+        {column.name: column for column in table.columns},
+        {column.name for column in table.columns if column.primary_key},
+    )
+    for name, table in Base.metadata.tables.items()
+}
+
+# Dialect used to render index DDL into the schema fingerprint
+_PG_DIALECT = postgresql.dialect()
+
+# PostgreSQL names for the plain column types used by the models
+_SQL_TYPES = {
+    String: lambda t: f"VARCHAR({t.length})" if t.length else "VARCHAR",
+    Integer: lambda t: "INTEGER",
+    BigInteger: lambda t: "BIGINT",
+    Date: lambda t: "DATE",
+}
+
+
+@functools.lru_cache(maxsize=64)
+def _compile_type(col_type, dialect) -> str:
+    """Compile a column type for a dialect, memoized per type instance."""
+    return str(col_type.compile(dialect=dialect))
+
+
+@functools.lru_cache(maxsize=16)
+def _add_columns_ddl(dialect, table_name: str, columns: tuple) -> TextClause:
+    """Build one ALTER TABLE adding every (name, type_sql, default_sql) column,
+    with identifiers quoted for the dialect."""
+    quote = dialect.identifier_preparer.quote
+    clauses = ", ".join(
+        " ".join(filter(None, ("ADD COLUMN", quote(name), type_sql, default_sql)))
+        for name, type_sql, default_sql in columns
+    )
+    return text(f"ALTER TABLE {quote(table_name)} {clauses}")
+
+
+@functools.lru_cache(maxsize=16)
+def _drop_constraint_ddl(dialect, table_name: str, constraint_name: str) -> TextClause:
+    """Build the statement dropping a table constraint, if it exists."""
+    quote = dialect.identifier_preparer.quote
+    return text(
+        f"ALTER TABLE {quote(table_name)} DROP CONSTRAINT IF EXISTS "
+        f"{quote(constraint_name)}"
+    )
+
+
+@functools.lru_cache(maxsize=16)
+def _add_primary_key_ddl(dialect, table_name: str, columns: tuple) -> TextClause:
+    """Build the statement adding a primary key over the given columns."""
+    quote = dialect.identifier_preparer.quote
+    return text(
+        f"ALTER TABLE {quote(table_name)} "
+        f"ADD PRIMARY KEY ({', '.join(quote(c) for c in columns)})"
+    )
+
+
+@functools.lru_cache(maxsize=16)
+def _add_primary_key_using_index_ddl(
+    dialect, table_name: str, index_name: str
+) -> TextClause:
+    """Build the statement turning a unique index into the primary key."""
+    quote = dialect.identifier_preparer.quote
+    return text(
+        f"ALTER TABLE {quote(table_name)} ADD CONSTRAINT "
+        f"{quote(table_name + '_pkey')} PRIMARY KEY USING INDEX {quote(index_name)}"
+    )
+
+
+def _drop_index_ddl(dialect, index_name: str) -> TextClause:
+    """Build the statement dropping an index, if it exists."""
+    return text(f"DROP INDEX IF EXISTS {dialect.identifier_preparer.quote(index_name)}")
+
+
+def _build_unique_index_concurrently(
+    engine, table_name: str, columns: tuple
+) -> str | None:
+    """Build a unique index for a future primary key without blocking writes.
+    Returns its name, or None when not on PostgreSQL or the build failed."""
+    if engine.dialect.name != "postgresql":
+        return None
+    quote = engine.dialect.identifier_preparer.quote
+    index_name = f"{table_name}_pkey_new"
+    try:
+        # CONCURRENTLY can't run inside a transaction block
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            # A failed earlier build leaves an invalid index behind
+            conn.execute(_drop_index_ddl(engine.dialect, index_name))
+            conn.execute(
+                text(
+                    f"CREATE UNIQUE INDEX CONCURRENTLY {quote(index_name)} ON "
+                    f"{quote(table_name)} ({', '.join(quote(c) for c in columns)})"
+                )
+            )
+        return index_name
+    except Exception as e:
+        logger.warning(f"Could not build {index_name} concurrently: {e}")
+        return None
+
 
 def get_sqlalchemy_type_sql(column: Column, engine) -> str:
     """Convert SQLAlchemy column type to PostgreSQL SQL type string."""
     col_type = column.type
-
-    # Map SQLAlchemy types to PostgreSQL types
-    if isinstance(col_type, String):
-        length = col_type.length
-        if length:
-            return f"VARCHAR({length})"
-        return "VARCHAR"
-    elif isinstance(col_type, Integer):
-        return "INTEGER"
-    elif isinstance(col_type, BigInteger):
-        return "BIGINT"
-    elif isinstance(col_type, Date):
-        return "DATE"
-    else:
-        # Fallback: use the type's compile method
-        return str(col_type.compile(dialect=engine.dialect))
+    formatter = _SQL_TYPES.get(type(col_type))
+    if formatter is not None:
+        return formatter(col_type)
+    # Fallback: use the type's compile method
+    return _compile_type(col_type, engine.dialect)
 
 
 def get_column_default_sql(column: Column) -> str:
@@ -70,106 +190,229 @@ def extract_default_value(column: Column):
     return None
 
 
-def migrate_add_missing_columns(engine):
-    """Add any missing columns from models to existing database tables."""
+def _snapshot_schema(engine) -> tuple[dict[str, set], dict[str, dict]]:
+    """Read every table's columns and primary key up front with SQLAlchemy's
+    batched reflection, one catalog query per kind instead of one per table.
+    Returns ({table: {column, ...}}, {table: {"name", "constrained_columns"}})."""
+    inspector = inspect(engine)
+    columns = {
+        table_name: {column["name"] for column in table_columns}
+        for (_, table_name), table_columns in inspector.get_multi_columns().items()
+    }
+    pks = {
+        table_name: pk_constraint
+        for (
+            _,
+            table_name,
+        ), pk_constraint in inspector.get_multi_pk_constraint().items()
+    }
+    return columns, pks
+
+
+@functools.lru_cache(maxsize=1)
+def schema_fingerprint() -> str:
+    """Hash every model table's columns, types, keys, defaults and indexes."""
+    parts = []
+    for table_name, table in sorted(Base.metadata.tables.items()):
+        for column in table.columns:
+            parts.append(
+                (
+                    table_name,
+                    column.name,
+                    repr(column.type),
+                    column.primary_key,
+                    column.nullable,
+                    get_column_default_sql(column),
+                )
+            )
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            # The compiled DDL covers columns and every dialect option
+            parts.append(str(CreateIndex(index).compile(dialect=_PG_DIALECT)))
+    return hashlib.sha256(repr(parts).encode()).hexdigest()
+
+
+def _fingerprint_applied(engine, fingerprint: str) -> bool:
+    """Whether the database was already migrated to this model fingerprint."""
     try:
-        inspector = inspect(engine)
+        with engine.connect() as conn:
+            stored = conn.execute(
+                select(_schema_cache.c.fingerprint).where(
+                    _schema_cache.c.fingerprint == fingerprint
+                )
+            ).scalar()
+        return stored is not None
+    except Exception:
+        # No cache table yet
+        return False
 
-        # Iterate through all tables in Base.metadata
-        for table_name, table in Base.metadata.tables.items():
-            if not inspector.has_table(table_name):
+
+def _record_fingerprint(engine, fingerprint: str) -> None:
+    """Remember the fingerprint the database is now migrated to."""
+    try:
+        _schema_cache.create(engine, checkfirst=True)
+        with engine.begin() as conn:
+            conn.execute(_schema_cache.delete())
+            conn.execute(insert(_schema_cache).values(fingerprint=fingerprint))
+    except Exception as e:
+        logger.warning(f"Could not record schema fingerprint: {e}")
+
+
+def migrate_schema(engine) -> None:
+    """Bring the database up to the models: create missing tables, columns and
+    indexes. When the database is already at the models' fingerprint this is a
+    single SELECT, with no reflection or DDL."""
+    fingerprint = schema_fingerprint()
+    if _fingerprint_applied(engine, fingerprint):
+        logger.info("Database schema matches the models, skipping migration")
+        return
+
+    Base.metadata.create_all(bind=engine)
+    migrated = migrate_add_missing_columns(engine)
+    migrated &= migrate_add_missing_indexes(engine)
+    if migrated:
+        _record_fingerprint(engine, fingerprint)
+
+
+def migrate_add_missing_columns(engine) -> bool:
+    """Add any missing columns from models to existing database tables.
+    Returns False if any part of the migration failed."""
+    try:
+        schema_columns, schema_pks = _snapshot_schema(engine)
+        migrated = True
+
+        # Iterate through all model tables
+        for table_name, (table, model_columns, model_pk_columns) in _MODEL_META.items():
+            if table_name not in schema_columns:
                 # Table doesn't exist, create_all will handle it
                 continue
 
             # Get existing columns in database
-            db_columns = {col["name"]: col for col in inspector.get_columns(table_name)}
-            db_column_names = set(db_columns.keys())
-
-            # Get model columns
-            model_columns = {col.name: col for col in table.columns}
-            model_column_names = set(model_columns.keys())
+            db_column_names = schema_columns[table_name]
 
             # Find missing columns
-            missing_columns = model_column_names - db_column_names
+            missing_columns = model_columns.keys() - db_column_names
+
+            pk_constraint = schema_pks.get(table_name)
+            db_pk_columns = set((pk_constraint or {}).get("constrained_columns") or ())
 
             if not missing_columns:
                 # Check if primary key needs updating
-                migrate_primary_key(engine, table_name, table, inspector)
+                if db_pk_columns != model_pk_columns:
+                    migrated &= migrate_primary_key(
+                        engine,
+                        table_name,
+                        db_pk_columns,
+                        model_pk_columns,
+                        pk_constraint,
+                    )
                 continue
 
             logger.info(
                 f"Found {len(missing_columns)} missing column(s) in {table_name}: {missing_columns}"
             )
 
-            with engine.begin() as conn:
-                for col_name in missing_columns:
-                    column = model_columns[col_name]
-                    sql_type = get_sqlalchemy_type_sql(column, engine)
-                    default_sql = get_column_default_sql(column)
-
-                    # Build ALTER TABLE statement
-                    alter_sql = (
-                        f"ALTER TABLE {table_name} ADD COLUMN {col_name} {sql_type}"
-                    )
-                    if default_sql:
-                        alter_sql += f" {default_sql}"
-
-                    logger.info(f"Adding column {col_name} to {table_name}")
-                    conn.execute(text(alter_sql))
-
-                    # If column has a default and is NOT NULL, update existing NULL rows
-                    if default_sql and not column.nullable:
-                        default_value = extract_default_value(column)
+            # One ALTER with every missing column takes the table lock once; a
+            # constant DEFAULT also fills existing rows, so no UPDATE is needed
+            columns = tuple(
+                (
+                    col_name,
+                    get_sqlalchemy_type_sql(model_columns[col_name], engine),
+                    get_column_default_sql(model_columns[col_name]),
+                )
+                for col_name in sorted(missing_columns)
+            )
 
-                        if default_value is not None:
-                            if isinstance(default_value, str):
-                                update_sql = f"UPDATE {table_name} SET {col_name} = '{default_value}' WHERE {col_name} IS NULL"
-                            else:
-                                update_sql = f"UPDATE {table_name} SET {col_name} = {default_value} WHERE {col_name} IS NULL"
-                            conn.execute(text(update_sql))
+            with engine.begin() as conn:
+                logger.info(
+                    f"Adding column(s) {sorted(missing_columns)} to {table_name}"
+                )
+                conn.execute(_add_columns_ddl(engine.dialect, table_name, columns))
 
                 # After adding columns, ensure any new primary key columns have values
-                model_pk_columns = {
-                    col.name for col in table.columns if col.primary_key
-                }
-                for pk_col_name in model_pk_columns:
-                    if pk_col_name in missing_columns:
-                        pk_column = model_columns[pk_col_name]
-                        if not pk_column.nullable:
-                            default_value = extract_default_value(pk_column)
-                            if default_value is not None:
-                                if isinstance(default_value, str):
-                                    update_sql = f"UPDATE {table_name} SET {pk_col_name} = '{default_value}' WHERE {pk_col_name} IS NULL"
-                                else:
-                                    update_sql = f"UPDATE {table_name} SET {pk_col_name} = {default_value} WHERE {pk_col_name} IS NULL"
-                                conn.execute(text(update_sql))
+                # in a single UPDATE over the table
+                backfill = {}
+                for pk_col_name in sorted(model_pk_columns & missing_columns):
+                    pk_column = model_columns[pk_col_name]
+                    if pk_column.nullable:
+                        continue
+                    default_value = extract_default_value(pk_column)
+                    if default_value is not None:
+                        backfill[pk_col_name] = default_value
+                if backfill:
+                    # Defaults are bound parameters, so the statement text only
+                    # depends on the column names
+                    quote = engine.dialect.identifier_preparer.quote
+                    names = list(backfill)
+                    assignments = ", ".join(
+                        f"{quote(name)} = COALESCE({quote(name)}, :v{i})"
+                        for i, name in enumerate(names)
+                    )
+                    condition = " OR ".join(f"{quote(name)} IS NULL" for name in names)
+                    conn.execute(
+                        text(
+                            f"UPDATE {quote(table_name)} SET {assignments} "
+                            f"WHERE {condition}"
+                        ),
+                        {f"v{i}": backfill[name] for i, name in enumerate(names)},
+                    )
 
                 # After adding columns, check if primary key needs updating
-                migrate_primary_key(engine, table_name, table, inspector, conn)
+                if db_pk_columns != model_pk_columns:
+                    migrated &= migrate_primary_key(
+                        engine,
+                        table_name,
+                        db_pk_columns,
+                        model_pk_columns,
+                        pk_constraint,
+                        conn,
+                    )
 
             logger.info(f"Successfully migrated {table_name} table")
 
+        return migrated
     except Exception as e:
         logger.error(f"Error during migration: {e}", exc_info=True)
+        return False
 
 
-def migrate_primary_key(engine, table_name: str, table, inspector, conn=None):
-    """Update primary key constraint if model definition differs from database."""
+def migrate_add_missing_indexes(engine) -> bool:
+    """Create model indexes that don't exist yet on already existing tables.
+    Returns False if creating them failed."""
     try:
-        pk_constraint = inspector.get_pk_constraint(table_name)
-        db_pk_columns = (
-            set(pk_constraint.get("constrained_columns", []))
-            if pk_constraint
-            else set()
-        )
-
-        # Get model primary key columns
-        model_pk_columns = {col.name for col in table.columns if col.primary_key}
+        indexes_by_table = {
+            table_name: {index["name"] for index in indexes}
+            for (_, table_name), indexes in inspect(engine).get_multi_indexes().items()
+        }
+        for table_name, table in Base.metadata.tables.items():
+            if not table.indexes or table_name not in indexes_by_table:
+                continue
+            db_indexes = indexes_by_table[table_name]
+            missing = [index for index in table.indexes if index.name not in db_indexes]
+            if not missing:
+                continue
+            with engine.begin() as conn:
+                for index in missing:
+                    logger.info(f"Creating index {index.name} on {table_name}")
+                    index.create(conn, checkfirst=True)
+        return True
+    except Exception as e:
+        logger.error(f"Error creating indexes: {e}", exc_info=True)
+        return False
 
-        # If primary keys match, no migration needed
-        if db_pk_columns == model_pk_columns:
-            return
 
+def migrate_primary_key(
+    engine,
+    table_name: str,
+    db_pk_columns: set,
+    model_pk_columns: set,
+    pk_constraint,
+    conn=None,
+) -> bool:
+    """Replace the table's primary key over ``db_pk_columns`` with one over
+    ``model_pk_columns``. Callers compare the two sets first; ``pk_constraint``
+    is the current key as {"name", "constrained_columns"}.
+    Returns False if the update failed."""
+    try:
         # Primary keys differ, need to update
         logger.info(
             f"Updating primary key for {table_name}: "
@@ -178,6 +421,30 @@ def migrate_primary_key(engine, table_name: str, table, inspector, conn=None):
 
         # Use provided connection or create new one
         if conn is None:
+            # Columns are committed already, so the new key's index can be built
+            # without blocking writes and then attached as the primary key
+            index_name = model_pk_columns and _build_unique_index_concurrently(
+                engine, table_name, tuple(sorted(model_pk_columns))
+            )
+            if index_name:
+                try:
+                    with engine.begin() as conn:
+                        update_primary_key(
+                            table_name,
+                            db_pk_columns,
+                            model_pk_columns,
+                            pk_constraint,
+                            conn,
+                            using_index=index_name,
+                        )
+                    return True
+                except Exception as e:
+                    logger.warning(
+                        f"Could not swap primary key of {table_name} onto "
+                        f"{index_name}, rebuilding it instead: {e}"
+                    )
+                    with engine.begin() as conn:
+                        conn.execute(_drop_index_ddl(conn.dialect, index_name))
             with engine.begin() as conn:
                 update_primary_key(
                     table_name, db_pk_columns, model_pk_columns, pk_constraint, conn
@@ -186,9 +453,10 @@ def migrate_primary_key(engine, table_name: str, table, inspector, conn=None):
             update_primary_key(
                 table_name, db_pk_columns, model_pk_columns, pk_constraint, conn
             )
-
+        return True
     except Exception as e:
         logger.error(f"Error updating primary key for {table_name}: {e}")
+        return False
 
 
 def update_primary_key(
@@ -197,21 +465,23 @@ def update_primary_key(
     model_pk_columns: set,
     pk_constraint,
     conn,
+    using_index: str = None,
 ):
-    """Helper method to update primary key constraint."""
+    """Helper method to update primary key constraint. With ``using_index`` the
+    new key takes over that prebuilt unique index instead of building one."""
     # Drop existing primary key if it exists
     if db_pk_columns:
-        constraint_name = pk_constraint.get("name", f"{table_name}_pkey")
-        conn.execute(
-            text(
-                f"ALTER TABLE {table_name} DROP CONSTRAINT IF EXISTS {constraint_name}"
-            )
-        )
+        constraint_name = pk_constraint.get("name") or f"{table_name}_pkey"
+        conn.execute(_drop_constraint_ddl(conn.dialect, table_name, constraint_name))
 
     # Add new primary key if model has primary key columns
     if model_pk_columns:
-        pk_columns_str = ", ".join(sorted(model_pk_columns))
-        conn.execute(
-            text(f"ALTER TABLE {table_name} ADD PRIMARY KEY ({pk_columns_str})")
-        )
+        pk_columns = tuple(sorted(model_pk_columns))
+        if using_index:
+            conn.execute(
+                _add_primary_key_using_index_ddl(conn.dialect, table_name, using_index)
+            )
+        else:
+            conn.execute(_add_primary_key_ddl(conn.dialect, table_name, pk_columns))
+        pk_columns_str = ", ".join(pk_columns)
         logger.info(f"Updated primary key for {table_name} to ({pk_columns_str})")
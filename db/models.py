@@ -1,28 +1,55 @@
 """Database models for the compliment bot."""
 
-from sqlalchemy import Column, String, Date, BigInteger, Integer, Boolean
-from sqlalchemy.orm import declarative_base
+import datetime
 
-# Base class for the database models
-Base = declarative_base()
+from sqlalchemy import String, Date, BigInteger, Integer, Boolean, Index, text
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+
+
+class Base(DeclarativeBase):
+    """Base class for the database models."""
 
 
 class Compliment(Base):
     """Model for storing daily compliments."""
 
     __tablename__ = "compliments"
-
-    date = Column(Date, primary_key=True)
-    language = Column(String, primary_key=True)  # 'en' or 'ru'
-    content = Column(String)
+    # Covering index: the broadcast join reads content without touching the heap
+    __table_args__ = (
+        Index(
+            "ix_compliments_date_lang",
+            "date",
+            "language",
+            postgresql_include=["content"],
+        ),
+        # Rows are appended in date order, so a BRIN index covers date range
+        # scans in a few pages; point lookups keep using the primary key
+        Index(
+            "ix_compliments_date_brin",
+            "date",
+            postgresql_using="brin",
+            postgresql_with={"pages_per_range": 32},
+        ),
+    )
+
+    date: Mapped[datetime.date] = mapped_column(Date, primary_key=True)
+    language: Mapped[str] = mapped_column(String, primary_key=True)  # 'en' or 'ru'
+    content: Mapped[str | None] = mapped_column(String)
 
 
 class UserSettings(Base):
     """Model for storing user preferences."""
 
     __tablename__ = "user_settings"
-
-    chat_id = Column(BigInteger, primary_key=True)
-    hour = Column(Integer, default=8)  # Hour in GMT (0-23)
-    language = Column(String, default="en")  # Language code: 'en' or 'ru'
-    activated = Column(Boolean, default=False)  # Whether user has activated the bot
+    # Partial index over activated users only, for the hourly broadcast query
+    __table_args__ = (
+        Index("ix_us_activated_hour", "hour", postgresql_where=text("activated")),
+    )
+
+    chat_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    # Hour in GMT (0-23)
+    hour: Mapped[int | None] = mapped_column(Integer, default=8)
+    # Language code: 'en' or 'ru'
+    language: Mapped[str | None] = mapped_column(String, default="en")
+    # Whether user has activated the bot
+    activated: Mapped[bool | None] = mapped_column(Boolean, default=False)
@@ -1,14 +1,30 @@
+import functools
 import os
 import random
-from typing import NamedTuple
+from dataclasses import dataclass
 
 from newsapi import NewsApiClient
-from setup import get_logger, get_config
+from cache import TTLCache
+from setup import get_logger, get_int, get_str
 
 logger = get_logger(__name__)
 
 
-class Headline(NamedTuple):
+@functools.lru_cache(maxsize=1)
+def _get_articles_cache() -> TTLCache:
+    """Get the cache of top headlines by (category, language); they change
+    slowly over the day. Built on first use, after the config is loaded."""
+    return TTLCache(maxsize=16, ttl=get_int("news.cache_ttl", 900))
+
+
+@functools.lru_cache(maxsize=1)
+def _get_client() -> NewsApiClient:
+    """Get the NewsAPI client shared by all retrievers, reusing its HTTP session."""
+    return NewsApiClient(api_key=os.getenv("NEWSAPI_API_KEY"))
+
+
+@dataclass(slots=True, frozen=True)
+class Headline:
     title: str
     description: str
 
@@ -21,25 +37,28 @@ class FreshHeadlinesRetriever:
         language: str = None,
     ):
         # Use config defaults if not provided
-        self.category = category or get_config("news.category", "general")
-        self.page_size = page_size or get_config("news.page_size", 10)
-        self.language = language or get_config("news.language", "en")
-        self.newsapi = NewsApiClient(api_key=os.getenv("NEWSAPI_API_KEY"))
+        self.category = category or get_str("news.category", "general")
+        self.page_size = page_size or get_int("news.page_size", 10)
+        self.language = language or get_str("news.language", "en")
+        self.newsapi = _get_client()
 
     def get_headlines(self):
         try:
-            top_headlines = self.newsapi.get_top_headlines(
-                language=self.language,
-                category=self.category,
-            )
-            articles = top_headlines.get("articles", [])
+            key = (self.category, self.language)
+            cache = _get_articles_cache()
+            articles = cache.get(key)
+            if articles is None:
+                top_headlines = self.newsapi.get_top_headlines(
+                    language=self.language,
+                    category=self.category,
+                )
+                articles = tuple(top_headlines.get("articles", []))
+                cache[key] = articles
             sampled_articles = random.sample(
                 articles, min(self.page_size, len(articles))
             )
             return [
-                Headline(
-                    title=article.get("title"), description=article.get("description")
-                )
+                Headline(article.get("title"), article.get("description"))
                 for article in sampled_articles
             ]
         except Exception as e:
@@ -4,14 +4,32 @@ Handles logging configuration, environment variable loading, and config manageme
 """
 
 import logging
+import sys
 import yaml
 from pathlib import Path
 from typing import Dict, Any
 from dotenv import load_dotenv
 
 
+# libyaml's C parser when PyYAML was built with it, else the pure-Python one
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
 # Global config variable
 _config: Dict[str, Any] = {}
+# Every config value by dotted key path, rebuilt on each load
+_flat_config: Dict[str, Any] = {}
+# Values already converted by the typed accessors, cleared on each load
+_typed_config: Dict[tuple, Any] = {}
+
+
+def flatten(tree: Dict[str, Any], prefix: str = ""):
+    """Yield (dotted key path, value) for every node of a nested YAML tree,
+    as used by the config and the translations."""
+    for k, v in tree.items():
+        path = f"{prefix}{k}"
+        yield path, v
+        if isinstance(v, dict):
+            yield from flatten(v, f"{path}.")
 
 
 def load_config(config_path: str = "config.yaml") -> Dict[str, Any]:
@@ -24,14 +42,16 @@ def load_config(config_path: str = "config.yaml") -> Dict[str, Any]:
     Returns:
         Configuration dictionary
     """
-    global _config
+    global _config, _flat_config
 
     config_file = Path(config_path)
     if not config_file.exists():
         raise FileNotFoundError(f"Config file not found: {config_path}")
 
     with open(config_file, "r", encoding="utf-8") as f:
-        _config = yaml.safe_load(f)
+        _config = yaml.load(f, Loader=YAML_LOADER)
+    _flat_config = {sys.intern(k): v for k, v in flatten(_config or {})}
+    _typed_config.clear()
 
     return _config
 
@@ -53,15 +73,69 @@ def get_config(key: str = None, default: Any = None) -> Any:
     if key is None:
         return _config
 
-    keys = key.split(".")
-    value = _config
+    return _flat_config.get(key, default)
+
 
+def _get_typed(key: str, default: Any, cast) -> Any:
+    """Get a config value converted with cast, converting each key only once."""
+    cache_key = (key, cast, default)
     try:
-        for k in keys:
-            value = value[k]
-        return value
-    except (KeyError, TypeError):
-        return default
+        return _typed_config[cache_key]
+    except KeyError:
+        pass
+    value = get_config(key)
+    # A key present but left empty in YAML is null; treat it as missing
+    if value is None:
+        value = default
+    else:
+        try:
+            value = cast(value)
+        except (TypeError, ValueError):
+            value = default
+    _typed_config[cache_key] = value
+    return value
+
+
+def get_int(key: str, default: int = 0) -> int:
+    """
+    Get a configuration value as an int.
+
+    Args:
+        key: Configuration key path (dot notation)
+        default: Value used if the key is missing or not a number
+
+    Returns:
+        Integer configuration value
+    """
+    return _get_typed(key, default, int)
+
+
+def get_float(key: str, default: float = 0.0) -> float:
+    """
+    Get a configuration value as a float.
+
+    Args:
+        key: Configuration key path (dot notation)
+        default: Value used if the key is missing or not a number
+
+    Returns:
+        Float configuration value
+    """
+    return _get_typed(key, default, float)
+
+
+def get_str(key: str, default: str = "") -> str:
+    """
+    Get a configuration value as a string.
+
+    Args:
+        key: Configuration key path (dot notation)
+        default: Value used if the key is missing
+
+    Returns:
+        String configuration value
+    """
+    return _get_typed(key, default, str)
 
 
 def setup_logging(level: int = None, format_string: str = None) -> None:
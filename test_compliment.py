@@ -8,6 +8,7 @@ Usage:
 """
 
 import argparse
+import asyncio
 from setup import setup_application, get_logger
 from compliment import ComplimentGenerator
 from news import FreshHeadlinesRetriever
@@ -39,7 +40,7 @@ def main():
     generator = ComplimentGenerator(news_client, language=args.language)
 
     # Generate compliment
-    compliment = generator.generate_compliment_for_date()
+    compliment = asyncio.run(generator.generate_compliment_for_date())
 
     if compliment:
         print(f"\n{'=' * 60}")
@@ -3,13 +3,18 @@ Translation system for the compliment bot.
 Loads translations from YAML files and provides a simple interface.
 """
 
+import functools
+import string
 import yaml
 from pathlib import Path
-from typing import Dict, Any
-from setup import get_logger
+from typing import Callable, Dict, Any, Tuple
+from setup import YAML_LOADER, flatten, get_logger
 
 logger = get_logger(__name__)
 
+# Languages with a translation file; the authoritative list for validation
+SUPPORTED_LANGUAGES = frozenset({"en", "ru"})
+
 # Cache for loaded translations
 _translations_cache: Dict[str, Dict[str, Any]] = {}
 
@@ -19,12 +24,12 @@ def load_translations(language: str = "en") -> Dict[str, Any]:
     Load translations for a specific language.
 
     Args:
-        language: Language code ('en' or 'ru')
+        language: Language code, one of SUPPORTED_LANGUAGES
 
     Returns:
         Dictionary with translations
     """
-    if language not in ("en", "ru"):
+    if language not in SUPPORTED_LANGUAGES:
         logger.warning(f"Unknown language {language}, falling back to 'en'")
         language = "en"
 
@@ -45,7 +50,7 @@ def load_translations(language: str = "en") -> Dict[str, Any]:
 
     try:
         with open(translation_file, "r", encoding="utf-8") as f:
-            translations = yaml.safe_load(f)
+            translations = yaml.load(f, Loader=YAML_LOADER)
             _translations_cache[language] = translations
             return translations
     except Exception as e:
@@ -59,31 +64,23 @@ def load_translations(language: str = "en") -> Dict[str, Any]:
 def get_translation(key: str, language: str = "en", default: str = None) -> str:
     """
     Get a translation by key path (e.g., 'messages.start').
+    Keys missing in the requested language fall back to English.
 
     Args:
         key: Translation key path (dot notation)
-        language: Language code ('en' or 'ru')
+        language: Language code, one of SUPPORTED_LANGUAGES
         default: Default value if key not found
 
     Returns:
         Translated string
     """
-    translations = load_translations(language)
-
-    if not translations:
-        return default or key
-
-    # Navigate through nested dictionary
-    keys = key.split(".")
-    value = translations
-
-    try:
-        for k in keys:
-            value = value[k]
-        return value
-    except (KeyError, TypeError):
+    value = _flat_translations.get((language, key))
+    if value is None:
+        value = _flat_translations.get(("en", key))
+    if value is None:
         logger.warning(f"Translation key not found: {key} for language {language}")
         return default or key
+    return value
 
 
 def format_translation(
@@ -94,7 +91,7 @@ def format_translation(
 
     Args:
         key: Translation key path (dot notation)
-        language: Language code ('en' or 'ru')
+        language: Language code, one of SUPPORTED_LANGUAGES
         default: Default value if key not found
         **kwargs: Arguments to format into the translation
 
@@ -103,7 +100,40 @@ def format_translation(
     """
     translation = get_translation(key, language, default)
     try:
-        return translation.format(**kwargs)
+        return _compile_template(translation)(kwargs)
     except (KeyError, ValueError) as e:
         logger.warning(f"Error formatting translation {key}: {e}")
         return translation
+
+
+@functools.lru_cache(maxsize=256)
+def _compile_template(template: str) -> Callable[[Dict[str, Any]], str]:
+    """
+    Parse a format template once into a function of the keyword arguments.
+    Templates using only plain named fields are joined directly; anything else
+    (format specs, conversions, indexing) falls back to str.format.
+
+    Args:
+        template: Translation string with {name} placeholders
+
+    Returns:
+        Function taking the kwargs dict and returning the formatted string
+    """
+    parts = []
+    for literal, field, spec, conversion in string.Formatter().parse(template):
+        if field is not None and (spec or conversion or not field.isidentifier()):
+            return lambda kwargs: template.format(**kwargs)
+        parts.append((literal, field))
+    return lambda kwargs: "".join(
+        literal if field is None else f"{literal}{kwargs[field]}"
+        for literal, field in parts
+    )
+
+
+# Every translation by (language, dotted key), built once at import so lookups
+# are a single hash instead of a key split and a nested dict walk
+_flat_translations: Dict[Tuple[str, str], Any] = {
+    (language, key): value
+    for language in SUPPORTED_LANGUAGES
+    for key, value in flatten(load_translations(language))
+}